@@ -0,0 +1,45 @@
+import hmac
+
+from flask import Blueprint, abort, jsonify, request
+
+from services.profiler import Profiler
+
+
+class AdminController:
+    def __init__(self, profiler: Profiler, admin_token: str):
+        self.profiler = profiler
+        self.admin_token = admin_token
+        self.admin_routes = Blueprint('admin_routes', __name__, url_prefix="/admin")
+
+        @self.admin_routes.before_request
+        def check_token():
+            token = request.headers.get("X-Admin-Token", "")
+            if not hmac.compare_digest(token.encode('utf-8'), self.admin_token.encode('utf-8')):
+                abort(403, "Forbidden")
+
+        @self.admin_routes.route("/profile", methods=["GET"])
+        def get_status():
+            return jsonify(self.profiler.status())
+
+        @self.admin_routes.route("/profile/sample", methods=["POST"])
+        def start_sampling():
+            seconds = max(1, min(request.args.get("seconds", default=30, type=float), 600))
+            try:
+                path = self.profiler.sampling.start(seconds)
+            except RuntimeError as e:
+                abort(409, str(e))
+            return jsonify({"message": f"Sampling for {seconds} seconds", "output": path})
+
+        @self.admin_routes.route("/profile/stories", methods=["POST"])
+        def profile_stories():
+            count = max(0, request.args.get("count", default=1, type=int))
+            self.profiler.profile_next_stories(count)
+            return jsonify({"message": f"Profiling the next {count} story generations"})
+
+        @self.admin_routes.route("/profile/slow-requests", methods=["GET"])
+        def get_slow_requests():
+            return jsonify(list(self.profiler.slow_requests))
+
+        @self.admin_routes.route("/profile/dump", methods=["POST"])
+        def dump():
+            return jsonify({"output": self.profiler.dump()})
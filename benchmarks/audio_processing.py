@@ -0,0 +1,56 @@
+import argparse
+import time
+
+import numpy as np
+from pydub import AudioSegment
+
+from services.voice.audio_processing import AudioPostProcessor
+
+
+def make_clip(speech_seconds: float, sample_rate: int, lead_seconds: float = 0.5, tail_seconds: float = 1.0, seed: int = 0) -> AudioSegment:
+    # Speech-like signal: a few harmonics of a wandering pitch under a syllable-rate envelope, framed by silence
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(speech_seconds * sample_rate)) / sample_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    speech = 0.3 * voice * envelope + 0.005 * rng.standard_normal(len(t))
+
+    samples = np.concatenate([
+        np.zeros(int(lead_seconds * sample_rate)),
+        speech / np.max(np.abs(speech)) * 0.5,
+        np.zeros(int(tail_seconds * sample_rate)),
+    ])
+    data = (samples * 32767).astype('<i2').tobytes()
+    return AudioSegment(data=data, sample_width=2, frame_rate=sample_rate, channels=1)
+
+
+def format_size(size: int) -> str:
+    return f"{size / 1e6:.1f} MB" if size >= 1e6 else f"{size / 1e3:.0f} KB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure AudioPostProcessor on synthetic speech-like clips")
+    parser.add_argument("--durations", type=float, nargs="+", default=[2, 5, 15], help="speech length of each clip in seconds")
+    parser.add_argument("--sample-rate", type=int, default=48000)
+    parser.add_argument("--target-sample-rate", type=int, default=24000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    processor = AudioPostProcessor(target_sample_rate=args.target_sample_rate)
+    for duration in args.durations:
+        clip = make_clip(duration, args.sample_rate)
+        processed = processor.process_segment(clip)
+
+        timings = []
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            processor.process_segment(clip)
+            timings.append(time.perf_counter() - started)
+
+        print(f"{duration:g}s clip: {np.median(timings) * 1000:.0f} ms, {format_size(len(clip.raw_data))} -> {format_size(len(processed.raw_data))} PCM")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+from models.config import Config
+
+
+def normalize_speaker(name: str) -> str:
+    # LLM output varies case, "ё"/"е", punctuation and spacing in speaker names ("Губка-Боб", "ГУБКА БОБ"),
+    # and may attach stage directions to them ("Патрик (удивлённо)", "Сквидвард [шепчет]")
+    name = re.sub(r"\(.*?\)|\[.*?\]", "", name)
+    name = unicodedata.normalize("NFKC", name).casefold().replace("ё", "е")
+    return re.sub(r"[\W_]+", "", name)
+
+
+class CompiledConfig:
+    def __init__(self, config: Config, supported_voices: Optional[List[str]] = None):
+        self.config = config
+        self.system_prompt = config.system_prompt
+        self.voice_generator = config.voice_generator
+        self.dialogue_data = config.dialogue_data
+        self.voice_by_speaker: Dict[str, str] = {}
+        self.speaker_by_key: Dict[str, str] = {}
+
+        for character in config.dialogue_data.characters:
+            if supported_voices is not None and character.voice not in supported_voices:
+                raise ValueError(f"Voice '{character.voice}' of '{character.name}' is not supported by {config.voice_generator}. Choose from {supported_voices}.")
+            for name in [character.name, *character.aliases]:
+                key = normalize_speaker(name)
+                if not key:
+                    raise ValueError(f"Speaker name '{name}' of '{character.name}' is empty after normalization")
+                if self.speaker_by_key.get(key, character.name) != character.name:
+                    raise ValueError(f"Speaker name '{name}' is ambiguous between '{self.speaker_by_key[key]}' and '{character.name}'")
+                self.speaker_by_key[key] = character.name
+                self.voice_by_speaker[key] = character.voice
+
+    def get_voice_id(self, speaker: str) -> Optional[str]:
+        return self.voice_by_speaker.get(normalize_speaker(speaker))
+
+    def get_character_name(self, speaker: str) -> Optional[str]:
+        return self.speaker_by_key.get(normalize_speaker(speaker))
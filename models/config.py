@@ -1,10 +1,11 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List
 
 @dataclass
 class Character:
     name: str
     voice: str
+    aliases: List[str] = field(default_factory=list)
 
 @dataclass
 class DialogueData:
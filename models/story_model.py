@@ -1,13 +1,17 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
+from models.story_status import StoryStatus
+
 
 class Scenario(BaseModel):
     character: str
     text: str
     sound: str
+    duration: Optional[float] = None
+    ready: bool = True
 
 class StoryModel(BaseModel):
     id: str = Field(..., alias='_id')
@@ -16,3 +20,8 @@ class StoryModel(BaseModel):
     topic: str
     scenario: List[Scenario]
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    status: str = StoryStatus.READY.value
+
+    def ready_lines(self) -> List[Scenario]:
+        ready_count = next((pos for pos, line in enumerate(self.scenario) if not line.ready), len(self.scenario))
+        return self.scenario[:ready_count]
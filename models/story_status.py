@@ -0,0 +1,5 @@
+from enum import Enum
+
+class StoryStatus(Enum):
+    STREAMING = "STREAMING"
+    READY = "READY"
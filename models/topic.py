@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -9,3 +10,7 @@ class Topic(BaseModel):
     requestor_name: str
     text: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    story_id: Optional[str] = None
+    story_text: Optional[List[str]] = None
+    completed_lines: List[int] = Field(default_factory=list)
+    attempts: int = 0
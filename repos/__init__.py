@@ -1,2 +1,4 @@
 from .story_repository import StoryRepository
-from .topic_repository import TopicRepository
\ No newline at end of file
+from .topic_repository import TopicRepository
+from .unit_of_work import UnitOfWork
+from .write_batcher import WriteBatcher
@@ -1,32 +1,68 @@
 import os
 import shutil
-from typing import Optional
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 
+from pymongo import ASCENDING, InsertOne, ReturnDocument, UpdateOne
 from pymongo.collection import Collection
 
-from models.story_model import StoryModel
+from models.story_model import Scenario, StoryModel
+from models.story_status import StoryStatus
 from models.topic_type import TopicType
+from services.scheduler import BaseScheduler, StrictPriorityScheduler
+
+from .unit_of_work import UnitOfWork
+from .write_batcher import WriteBatcher
 
 
 class StoryRepository:
-    def __init__(self, audio_dir: str, collection: Collection):
+    def __init__(self, audio_dir: str, collection: Collection, scheduler: Optional[BaseScheduler] = None, reservation_seconds: float = 600, write_batcher: Optional[WriteBatcher] = None):
         self.audio_dir = audio_dir
         self.collection = collection
+        self.write_batcher = write_batcher
+        self.scheduler = scheduler or StrictPriorityScheduler()
+        self.reservation_seconds = reservation_seconds
+        self.collection.create_index([("topic_type", ASCENDING), ("created_at", ASCENDING)])
 
-    def create_story(self, story: StoryModel):
-        self.collection.insert_one(story.dict(by_alias=True))
+    def create_story(self, story: StoryModel, unit_of_work: Optional[UnitOfWork] = None):
+        if unit_of_work:
+            unit_of_work.add(self.collection, InsertOne(story.dict(by_alias=True)))
+        else:
+            self.collection.insert_one(story.dict(by_alias=True))
 
     def get_story(self, id: str) -> StoryModel:
         document = self.collection.find_one({"_id": id})
         if document:
-            document['_id'] = str(document['_id'])
-            return StoryModel(**document)
+            return self._to_story_model(document)
         return None
 
-    def update_story(self, id: str, story: StoryModel):
-        self.collection.update_one({"_id": id}, {"$set": story.dict(by_alias=True)})
+    def has_story(self, id: str) -> bool:
+        return self.collection.count_documents({"_id": id}, limit=1) > 0
+
+    def update_story_content(self, story: StoryModel, unit_of_work: Optional[UnitOfWork] = None):
+        # $set keeps fields owned by readers, such as lookahead reservations, intact. No upsert, so a story
+        # deleted by a client stays deleted, and created_at is kept so the story does not move in the queue.
+        document = story.dict(by_alias=True)
+        document.pop("_id", None)
+        document.pop("created_at", None)
+        if unit_of_work:
+            unit_of_work.add(self.collection, UpdateOne({"_id": story.id}, {"$set": document}))
+        else:
+            self.collection.update_one({"_id": story.id}, {"$set": document})
+
+    def mark_line_ready(self, id: str, pos: int, duration: Optional[float]):
+        update = {"$set": {f"scenario.{pos}.ready": True, f"scenario.{pos}.duration": duration}}
+        if self.write_batcher:
+            self.write_batcher.add(self.collection, UpdateOne({"_id": id}, update))
+        else:
+            self.collection.update_one({"_id": id}, update)
 
-    def delete_story(self, id: str):
+    def flush_writes(self):
+        if self.write_batcher:
+            self.write_batcher.flush()
+
+    def delete_story(self, id: str) -> bool:
         result = self.collection.delete_one({"_id": id})
         
         if result.deleted_count > 0:
@@ -35,24 +71,79 @@ class StoryRepository:
             if os.path.exists(directory_to_delete):
                 shutil.rmtree(directory_to_delete)
 
+        return result.deleted_count > 0
 
-    def get_total_count(self) -> int:
-        return self.collection.count_documents({})
 
     def get_count_by_topic_type(self, topic_type: TopicType) -> int:
         return self.collection.count_documents({"topic_type": topic_type.value})
-    
-    def get_story_by_priority(self) -> Optional[StoryModel]:
-        document = self.collection.find_one({"topic_type": TopicType.VIP.value})
-        
-        if document is None:
-            document = self.collection.find_one({"topic_type": TopicType.USER.value})
 
-        if document is None:
-            document = self.collection.find_one({"topic_type": TopicType.SYSTEM.value})
-        
+    def get_story_ids(self, topic_type: Optional[TopicType] = None, limit: int = 0) -> List[str]:
+        query = {} if topic_type is None else {"topic_type": topic_type.value}
+        documents = self.collection.find(query, {"_id": 1}).sort("created_at", ASCENDING).limit(limit)
+        return [str(document["_id"]) for document in documents]
+
+    def get_oldest_created_at_by_type(self, query: Optional[dict] = None) -> Dict[TopicType, datetime]:
+        documents = self.collection.aggregate([
+            {"$match": query or {}},
+            {"$sort": {"topic_type": ASCENDING, "created_at": ASCENDING}},
+            {"$group": {"_id": "$topic_type", "created_at": {"$first": "$created_at"}}},
+        ])
+        return {TopicType(document["_id"]): document["created_at"] for document in documents}
+
+    def get_story_by_priority(self, include_streaming: bool = False) -> Optional[StoryModel]:
+        topic_type, document = self._find_scheduled(include_streaming)
         if document is None:
             return None
-        
+
+        self.scheduler.record(topic_type)
+        return self._to_story_model(document)
+
+    def get_lookahead(self, client_id: str, count: int, include_streaming: bool = False) -> List[StoryModel]:
+        now = datetime.utcnow()
+        self.collection.update_many({"reserved_by": client_id}, {"$set": {"reserved_at": now}})
+        documents = list(self.collection.find({"reserved_by": client_id}).sort("reservation_order", ASCENDING).limit(count))
+
+        while len(documents) < count:
+            available = self._available_query(now, include_streaming)
+            topic_type = self.scheduler.select(self.get_oldest_created_at_by_type(available))
+            if topic_type is None:
+                break
+
+            # Claimed atomically so two clients never reserve the same story
+            document = self.collection.find_one_and_update(
+                {"topic_type": topic_type.value, **available},
+                {"$set": {"reserved_by": client_id, "reserved_at": now, "reservation_order": time.time_ns()}},
+                sort=[("created_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if document is None:
+                break
+
+            self.scheduler.record(topic_type)
+            documents.append(document)
+
+        return [self._to_story_model(document) for document in documents]
+
+    def _available_query(self, now: datetime, include_streaming: bool) -> dict:
+        expired_before = now - timedelta(seconds=self.reservation_seconds)
+        conditions = [{"$or": [{"reserved_by": None}, {"reserved_at": {"$lt": expired_before}}]}]
+        if include_streaming:
+            # A streaming story can be played once its first line is voiced
+            conditions.append({"$or": [{"status": {"$ne": StoryStatus.STREAMING.value}}, {"scenario.0.ready": True}]})
+        else:
+            conditions.append({"status": {"$ne": StoryStatus.STREAMING.value}})
+        return {"$and": conditions}
+
+    def _find_scheduled(self, include_streaming: bool = False):
+        available = self._available_query(datetime.utcnow(), include_streaming)
+        topic_type = self.scheduler.select(self.get_oldest_created_at_by_type(available))
+        if topic_type is None:
+            return None, None
+        return topic_type, self.collection.find_one({"topic_type": topic_type.value, **available}, sort=[("created_at", ASCENDING)])
+
+    def _to_story_model(self, document: dict) -> StoryModel:
+        # Stories are only written from validated StoryModel instances or typed field updates such as
+        # mark_line_ready, so validation is skipped on read.
         document['_id'] = str(document['_id'])
-        return StoryModel(**document)
\ No newline at end of file
+        document['scenario'] = [Scenario.model_construct(**line) for line in document.get('scenario', [])]
+        return StoryModel.model_construct(**document)
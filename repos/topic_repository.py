@@ -1,49 +1,66 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
 
 from bson import ObjectId
-from pymongo import ASCENDING
+from pymongo import ASCENDING, DeleteOne, ReturnDocument, UpdateOne
 from pymongo.collection import Collection
+from pymongo.write_concern import WriteConcern
 
 from models.topic import Topic
 from models.topic_type import TopicType
 
+from .unit_of_work import UnitOfWork
+from .write_batcher import WriteBatcher
+
 
 class TopicRepository:
-    def __init__(self, collection: Collection):
+    def __init__(self, collection: Collection, write_batcher: Optional[WriteBatcher] = None, filler_write_concern: Optional[WriteConcern] = None):
         self.collection = collection
+        self.write_batcher = write_batcher
+        self.filler_collection = collection.with_options(write_concern=filler_write_concern) if filler_write_concern else collection
+        self.collection.create_index([("topic_type", ASCENDING), ("created_at", ASCENDING)])
 
     def create_topic(self, topic: Topic) -> Topic:
         result = self.collection.insert_one(topic.dict(by_alias=True))
         topic._id = str(result.inserted_id)
         return topic
 
+    def create_topics(self, topics: List[Topic]):
+        # Filler topics are cheap to regenerate, so they may use a weaker write concern
+        self.filler_collection.insert_many([topic.dict(by_alias=True) for topic in topics], ordered=False)
+
     def get_topic_by_id(self, id: str) -> Topic:
         document = self.collection.find_one({"_id": id})
         if document:
             return Topic(**document)
         return None
     
-    def get_oldest_topic_by_type(self, topic_type: TopicType) -> Topic:
-        document = self.collection.find_one({"topic_type": topic_type.value}, sort=[("created_at", ASCENDING)])
+    def get_oldest_topic_by_type(self, topic_type: TopicType, exclude_ids: Iterable[str] = ()) -> Topic:
+        query = {"topic_type": topic_type.value}
+        if exclude_ids:
+            query["_id"] = {"$nin": list(exclude_ids)}
+        document = self.collection.find_one(query, sort=[("created_at", ASCENDING)])
         if document:
             document['_id'] = str(document['_id'])
             return Topic(**document)
         return None
     
-    def get_topic_by_priority(self) -> Optional[Topic]:
-        document = self.collection.find_one({"topic_type": TopicType.VIP.value})
-        
-        if document is None:
-            document = self.collection.find_one({"topic_type": TopicType.USER.value})
-
-        if document is None:
-            document = self.collection.find_one({"topic_type": TopicType.SYSTEM.value})
-        
-        if document is None:
-            return None
-        
-        document['_id'] = str(document['_id'])
-        return Topic(**document)
+    def get_checkpointed_topic(self, exclude_ids: Iterable[str] = ()) -> Optional[Topic]:
+        query = {"story_text": {"$ne": None}}
+        if exclude_ids:
+            query["_id"] = {"$nin": list(exclude_ids)}
+        document = self.collection.find_one(query, sort=[("created_at", ASCENDING)])
+        if document:
+            document['_id'] = str(document['_id'])
+            return Topic(**document)
+        return None
+
+    def get_oldest_created_at_by_type(self) -> Dict[TopicType, datetime]:
+        documents = self.collection.aggregate([
+            {"$sort": {"topic_type": ASCENDING, "created_at": ASCENDING}},
+            {"$group": {"_id": "$topic_type", "created_at": {"$first": "$created_at"}}},
+        ])
+        return {TopicType(document["_id"]): document["created_at"] for document in documents}
 
     def get_n_oldest_topics(self, n: int) -> List[Topic]:
         documents = self.collection.find().sort("created_at", ASCENDING).limit(n)
@@ -56,5 +73,26 @@ class TopicRepository:
         self.collection.update_one({"_id": id}, {"$set": topic.dict(by_alias=True)})
         return self.get_topic_by_id(id)
 
-    def delete_topic(self, id: str):
-        self.collection.delete_one({"_id": id})
+    def save_story_text(self, id: str, story_id: str, story_text: List[str]):
+        self.collection.update_one({"_id": id}, {"$set": {"story_id": story_id, "story_text": story_text, "completed_lines": []}})
+
+    def mark_line_done(self, id: str, pos: int):
+        update = {"$addToSet": {"completed_lines": pos}}
+        if self.write_batcher:
+            self.write_batcher.add(self.collection, UpdateOne({"_id": id}, update))
+        else:
+            self.collection.update_one({"_id": id}, update)
+
+    def flush_writes(self):
+        if self.write_batcher:
+            self.write_batcher.flush()
+
+    def increment_attempts(self, id: str) -> int:
+        document = self.collection.find_one_and_update({"_id": id}, {"$inc": {"attempts": 1}}, projection={"attempts": 1}, return_document=ReturnDocument.AFTER)
+        return document["attempts"] if document else 0
+
+    def delete_topic(self, id: str, unit_of_work: Optional[UnitOfWork] = None):
+        if unit_of_work:
+            unit_of_work.add(self.collection, DeleteOne({"_id": id}))
+        else:
+            self.collection.delete_one({"_id": id})
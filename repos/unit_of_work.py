@@ -0,0 +1,56 @@
+import logging
+from collections import OrderedDict
+
+from pymongo import MongoClient
+from pymongo.collection import Collection
+
+TRANSACTION_TOPOLOGIES = ("ReplicaSetWithPrimary", "Sharded")
+
+
+class UnitOfWork:
+    def __init__(self, client: MongoClient, use_transactions: bool = True):
+        self.client = client
+        self.use_transactions = use_transactions
+        self.operations = OrderedDict()
+
+    def add(self, collection: Collection, operation):
+        key = (collection.database.name, collection.name)
+        if key not in self.operations:
+            self.operations[key] = (collection, [])
+        self.operations[key][1].append(operation)
+
+    def commit(self):
+        if not self.operations:
+            return
+
+        if self.use_transactions and self._supports_transactions():
+            with self.client.start_session() as session:
+                session.with_transaction(self._write)
+        else:
+            self._write(None)
+        self.operations.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.operations.clear()
+        return False
+
+    def _write(self, session):
+        for collection, operations in self.operations.values():
+            collection.bulk_write(operations, ordered=True, session=session)
+
+    def _supports_transactions(self) -> bool:
+        # Standalone servers reject transactions, so writes fall back to ordered bulk writes
+        topology = getattr(self.client, "topology_description", None)
+        if topology is None:
+            return False
+        try:
+            return topology.topology_type_name in TRANSACTION_TOPOLOGIES
+        except Exception as e:
+            logging.debug(f"Could not read Mongo topology: {e}")
+            return False
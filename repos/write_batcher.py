@@ -0,0 +1,46 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from pymongo.collection import Collection
+
+
+class WriteBatcher:
+    def __init__(self, flush_size: int = 50, flush_interval: float = 1.0):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pending = OrderedDict()
+        self.pending_count = 0
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        threading.Thread(target=self._run, name="mongo-write-batcher", daemon=True).start()
+
+    def add(self, collection: Collection, operation):
+        with self.lock:
+            key = (collection.database.name, collection.name)
+            if key not in self.pending:
+                self.pending[key] = (collection, [])
+            self.pending[key][1].append(operation)
+            self.pending_count += 1
+            if self.pending_count >= self.flush_size:
+                self.wakeup.set()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                batches = list(self.pending.values())
+                self.pending.clear()
+                self.pending_count = 0
+
+            for collection, operations in batches:
+                try:
+                    collection.bulk_write(operations, ordered=True)
+                except Exception as e:
+                    logging.error(f"Batched write of {len(operations)} operations to {collection.name} failed: {e}")
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
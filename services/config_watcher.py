@@ -0,0 +1,63 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from models.compiled_config import CompiledConfig
+
+
+class ConfigWatcher:
+    def __init__(self, config_name: str, paths: List[str], loader: Callable[[], CompiledConfig], interval_seconds: float = 5):
+        self.config_name = config_name
+        self.paths = paths
+        self.loader = loader
+        self.interval_seconds = interval_seconds
+        self.listeners: List[Callable[[CompiledConfig], None]] = []
+        self.mtimes = self._read_mtimes()
+
+    def subscribe(self, listener: Callable[[CompiledConfig], None]):
+        self.listeners.append(listener)
+
+    def start(self):
+        threading.Thread(target=self._watch, name=f"config-watcher-{self.config_name}", daemon=True).start()
+
+    def _watch(self):
+        # Any failure only skips this poll, a dead watcher thread would silently end hot reload for good
+        while True:
+            time.sleep(self.interval_seconds)
+            try:
+                mtimes = self._read_mtimes()
+                if mtimes != self.mtimes:
+                    self.mtimes = mtimes
+                    self.reload()
+            except Exception as e:
+                logging.error(f"Config {self.config_name} watcher poll failed: {e}")
+
+    def reload(self) -> bool:
+        # The new config is fully loaded and validated before any listener sees it, a broken file keeps the current one
+        try:
+            compiled = self.loader()
+        except Exception as e:
+            logging.error(f"Config {self.config_name} was not reloaded, keeping the current one: {e}")
+            return False
+
+        applied = True
+        for listener in self.listeners:
+            try:
+                listener(compiled)
+            except Exception as e:
+                logging.error(f"Config {self.config_name} reload listener {listener} failed: {e}")
+                applied = False
+        logging.info(f"Config {self.config_name} reloaded")
+        return applied
+
+    def _read_mtimes(self) -> Dict[str, Optional[int]]:
+        mtimes = {}
+        for path in self.paths:
+            # Editors that save by rename can remove the file between checks, so a missing file is not an error
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                mtimes[path] = None
+        return mtimes
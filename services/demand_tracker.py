@@ -0,0 +1,64 @@
+import math
+import threading
+import time
+from collections import deque
+
+
+class DemandTracker:
+    def __init__(self, target_lookahead_seconds: float, min_system_stories: int, max_system_stories: int, max_workers: int, window_seconds: float = 900, idle_seconds: float = 300):
+        self.target_lookahead_seconds = target_lookahead_seconds
+        self.min_system_stories = min_system_stories
+        self.max_system_stories = max_system_stories
+        self.max_workers = max_workers
+        self.window_seconds = window_seconds
+        self.idle_seconds = idle_seconds
+        self.started_at = time.monotonic()
+        self.last_request_at = None
+        self.consumed_at = deque()
+        self.generation_seconds = None
+        self.lock = threading.Lock()
+
+    def record_request(self):
+        with self.lock:
+            self.last_request_at = time.monotonic()
+
+    def record_consumed(self):
+        with self.lock:
+            now = time.monotonic()
+            self.last_request_at = now
+            self.consumed_at.append(now)
+            self._trim(now)
+
+    def record_generation(self, seconds: float):
+        with self.lock:
+            if self.generation_seconds is None:
+                self.generation_seconds = seconds
+            else:
+                self.generation_seconds = 0.7 * self.generation_seconds + 0.3 * seconds
+
+    def consumption_rate(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            if self.last_request_at is None or now - self.last_request_at > self.idle_seconds:
+                return 0.0
+            self._trim(now)
+            elapsed = min(self.window_seconds, now - self.started_at)
+            if elapsed <= 0:
+                return 0.0
+            return len(self.consumed_at) / elapsed
+
+    def system_buffer_target(self) -> int:
+        # Stories needed to cover the lookahead at the current consumption rate
+        target = math.ceil(self.consumption_rate() * self.target_lookahead_seconds)
+        return max(self.min_system_stories, min(self.max_system_stories, target))
+
+    def worker_target(self) -> int:
+        # Little's law: workers busy on average = arrival rate * time per story
+        rate = self.consumption_rate()
+        if rate == 0 or self.generation_seconds is None:
+            return 1
+        return max(1, min(self.max_workers, math.ceil(rate * self.generation_seconds)))
+
+    def _trim(self, now: float):
+        while self.consumed_at and now - self.consumed_at[0] > self.window_seconds:
+            self.consumed_at.popleft()
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+
+def make_cache_key(model: str, system_prompt: str, content: str, temperature: float) -> str:
+    prompt_hash = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()
+    raw_key = json.dumps([model, prompt_hash, content, temperature], ensure_ascii=False)
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+
+class BaseLLMCache(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[List[str]]:
+        pass
+
+    @abstractmethod
+    def put(self, key: str, response: List[str]):
+        pass
+
+
+class DiskLLMCache(BaseLLMCache):
+    SWEEP_INTERVAL_SECONDS = 3600
+
+    def __init__(self, directory: str, ttl_seconds: float, variants_per_key: int = 1):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.variants_per_key = max(1, variants_per_key)
+        self.lock = threading.Lock()
+        self.last_sweep = 0.0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self.lock:
+            variants = self._load(key)
+        # Keep calling the API until the key has collected all of its variants
+        if len(variants) < self.variants_per_key:
+            return None
+        return random.choice(variants)["response"]
+
+    def put(self, key: str, response: List[str]):
+        with self.lock:
+            variants = self._load(key)
+            variants.append({"created_at": time.time(), "response": response})
+            variants = variants[-self.variants_per_key:]
+            path = self._path(key)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(variants, file, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+            if time.time() - self.last_sweep >= min(self.ttl_seconds, self.SWEEP_INTERVAL_SECONDS):
+                self._sweep()
+
+    def _sweep(self):
+        # A file is rewritten on every put, so once its mtime is past the TTL every variant in it has expired
+        now = time.time()
+        self.last_sweep = now
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and now - entry.stat().st_mtime >= self.ttl_seconds:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError as e:
+                    logging.warning(f"Could not remove expired LLM cache entry {entry.path}: {e}")
+        if removed:
+            logging.info(f"Removed {removed} expired LLM cache entries")
+
+    def _load(self, key: str) -> list:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                variants = json.load(file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Dropping unreadable LLM cache entry {path}: {e}")
+            return []
+        now = time.time()
+        return [variant for variant in variants if now - variant["created_at"] < self.ttl_seconds]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
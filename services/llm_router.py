@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional
+
+import openai
+
+from services.profiler import profiled
+
+
+class LLMRouterException(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, requests_per_minute: float):
+        self.rate = requests_per_minute / 60
+        self.capacity = max(1.0, self.rate * 5)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def wait_time(self) -> float:
+        with self.lock:
+            self._refill()
+            return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+class LLMBackend:
+    def __init__(self, name: str, api_key: str, api_base: str, model: str, requests_per_minute: float = 60, request_timeout: float = 120):
+        self.name = name
+        self.api_key = api_key
+        self.api_base = api_base or None
+        self.model = model
+        self.request_timeout = request_timeout
+        self.rate_limiter = TokenBucket(requests_per_minute)
+        self.latency = None
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.lock = threading.Lock()
+
+    def complete(self, messages: list, temperature: float):
+        t0 = time.monotonic()
+        try:
+            reply = openai.ChatCompletion.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                api_key=self.api_key,
+                api_base=self.api_base,
+                request_timeout=self.request_timeout,
+            )
+        except Exception:
+            self._record_failure()
+            raise
+        self._record_success(time.monotonic() - t0)
+        return reply
+
+    def is_available(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def score(self) -> float:
+        # Lower is better; backends that were never measured are tried first
+        with self.lock:
+            return (self.latency or 0) * (1 + self.failures)
+
+    def _record_success(self, seconds: float):
+        with self.lock:
+            self.latency = seconds if self.latency is None else 0.7 * self.latency + 0.3 * seconds
+            self.failures = 0
+
+    def _record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.cooldown_until = time.monotonic() + min(300, 5 * 2 ** self.failures)
+
+
+class LLMRouter:
+    def __init__(self, backends: List[LLMBackend], hedge_after_seconds: float = 0):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend")
+        self.backends = backends
+        self.hedge_after_seconds = hedge_after_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max(4, 2 * len(backends)), thread_name_prefix="llm")
+
+    @property
+    def model(self) -> str:
+        return "+".join(sorted({backend.model for backend in self.backends}))
+
+    def complete(self, messages: list, temperature: float):
+        tried = set()
+        pending = {}
+        hedged = False
+        last_error = None
+
+        while True:
+            if not pending:
+                backend = self._pick(tried)
+                if backend is None:
+                    break
+                pending[self._submit(backend, messages, temperature)] = backend
+                tried.add(backend)
+
+            can_hedge = self.hedge_after_seconds > 0 and not hedged and len(tried) < len(self.backends)
+            done, _ = wait(pending, timeout=self.hedge_after_seconds if can_hedge else None, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Waiting for a rate limit token here would stop watching the primary, so the hedge is retried later instead
+                backend = self._pick(tried, blocking=False)
+                if backend is not None:
+                    hedged = True
+                    logging.info(f"LLM backend {list(pending.values())[0].name} is slow, hedging to {backend.name}")
+                    pending[self._submit(backend, messages, temperature)] = backend
+                    tried.add(backend)
+                continue
+
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    reply = future.result()
+                    logging.info(f"LLM reply served by {backend.name}")
+                    return reply
+                except Exception as e:
+                    logging.error(f"LLM backend {backend.name} failed: {e}")
+                    last_error = e
+
+        raise LLMRouterException("All LLM backends failed") from last_error
+
+    def _submit(self, backend: LLMBackend, messages: list, temperature: float):
+        return self.executor.submit(profiled(backend.complete), messages, temperature)
+
+    def _pick(self, exclude: set, blocking: bool = True) -> Optional[LLMBackend]:
+        candidates = [backend for backend in self.backends if backend not in exclude]
+        if not candidates:
+            return None
+
+        # Backends in cooldown are only used when nothing else is left
+        candidates = [backend for backend in candidates if backend.is_available()] or candidates
+        candidates.sort(key=lambda backend: backend.score())
+
+        while True:
+            for backend in candidates:
+                if backend.rate_limiter.try_acquire():
+                    return backend
+            if not blocking:
+                return None
+            time.sleep(min(backend.rate_limiter.wait_time() for backend in candidates))
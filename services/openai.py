@@ -1,25 +1,66 @@
 import logging
-import openai
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from services.llm_cache import BaseLLMCache, make_cache_key
+from services.llm_router import LLMBackend, LLMRouter
 
 class OpenAIApiException(Exception):
     pass
 
 class OpenAIApi:
-    def __init__(self, api_key, api_base):
-        openai.api_key = api_key
-        if api_base != "":
-            openai.api_base = api_base
+    def __init__(self, api_key, api_base, cache: Optional[BaseLLMCache] = None, model: str = "gpt-3.5-turbo", temperature: float = 1, router: Optional[LLMRouter] = None):
+        self.router = router or LLMRouter([LLMBackend("default", api_key, api_base, model)])
+        self.cache = cache
+        self.model = self.router.model
+        self.temperature = temperature
+        self.in_flight = {}
+        self.in_flight_lock = threading.Lock()
 
     def generate_text(self, script, content):
+        key = make_cache_key(self.model, script, content, self.temperature)
+
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logging.info("Text Generation served from cache")
+                return list(cached)
+
+        with self.in_flight_lock:
+            future = self.in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self.in_flight[key] = future
+
+        if not is_owner:
+            logging.info("Text Generation joined an identical in-flight request")
+            response = future.result()
+            return list(response) if response is not None else None
+
+        try:
+            response = self._generate_text(script, content)
+            if self.cache and response is not None:
+                self.cache.put(key, response)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.in_flight_lock:
+                del self.in_flight[key]
+
+    def _generate_text(self, script, content):
         try:
             logging.info("Text Generation Started")
-            reply = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
+            reply = self.router.complete(
+                [
                     {"role": "system", "content": script},
                     {"role": "user", "content": content},
                 ],
-                temperature=1
+                self.temperature
             )
             logging.debug(f"Script reply {reply}")
 
@@ -42,4 +83,4 @@ class OpenAIApi:
             raise e
         except Exception as e:
             logging.error(f"Error occurred in chat_gen: {e}")
-            raise OpenAIApiException("OpenAI API Error.") from e
\ No newline at end of file
+            raise OpenAIApiException("OpenAI API Error.") from e
@@ -0,0 +1,176 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+
+_active = threading.local()
+
+
+def profiled(fn):
+    # Tasks handed to thread pools run outside the cProfile of the story that submitted them, so each task
+    # gets its own profile that is merged into the story's. Without an active story profile fn is returned as is.
+    story_profile = getattr(_active, "story_profile", None)
+    if story_profile is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from the story's own profile and allows only one at a time
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            story_profile.add_task(profile)
+
+    return wrapper
+
+
+class StoryProfile:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.task_profiles = []
+        self.lock = threading.Lock()
+
+    def add_task(self, profile: cProfile.Profile):
+        with self.lock:
+            self.task_profiles.append(profile)
+
+    def to_stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.profile)
+        with self.lock:
+            for profile in self.task_profiles:
+                stats.add(profile)
+        return stats
+
+
+class SamplingProfiler:
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds: float, interval: float = 0.005) -> str:
+        with self.lock:
+            if self.is_running():
+                raise RuntimeError("Sampling profiler is already running")
+            path = os.path.join(self.output_dir, f"sample-{datetime.utcnow():%Y%m%d-%H%M%S}.txt")
+            self.thread = threading.Thread(target=self._run, args=(seconds, interval, path), name="sampling-profiler", daemon=True)
+            self.thread.start()
+        return path
+
+    def _run(self, seconds: float, interval: float, path: str):
+        own_id = threading.get_ident()
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                stacks[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+
+        # Collapsed stack format, one "frame;frame;frame count" line per stack, as used by flame graph tools
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        logging.info(f"Sampling profile written to {path} ({sum(stacks.values())} samples)")
+
+
+class Profiler:
+    def __init__(self, output_dir: str, slow_request_ms: float = 500, max_slow_requests: int = 200):
+        self.output_dir = output_dir
+        self.slow_request_ms = slow_request_ms
+        self.sampling = SamplingProfiler(output_dir)
+        self.slow_requests = deque(maxlen=max_slow_requests)
+        self.story_profiles_remaining = 0
+        self.story_profile_files = []
+        self.story_profile_lock = threading.Lock()
+        self.story_profile_active = False
+        self.metrics_providers: Dict[str, Callable[[], dict]] = {}
+
+    def profile_next_stories(self, count: int):
+        with self.story_profile_lock:
+            self.story_profiles_remaining = count
+
+    def start_story_profile(self) -> Optional[StoryProfile]:
+        if self.story_profiles_remaining <= 0:
+            return None
+        # Only one story is profiled at a time, newer Pythons allow a single active cProfile per process
+        with self.story_profile_lock:
+            if self.story_profiles_remaining <= 0 or self.story_profile_active:
+                return None
+            self.story_profiles_remaining -= 1
+            self.story_profile_active = True
+        story_profile = StoryProfile()
+        _active.story_profile = story_profile
+        story_profile.profile.enable()
+        return story_profile
+
+    def finish_story_profile(self, story_profile: StoryProfile, story_id: str):
+        story_profile.profile.disable()
+        _active.story_profile = None
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"story-{story_id}.pstats")
+        story_profile.to_stats().dump_stats(path)
+        with self.story_profile_lock:
+            self.story_profile_active = False
+            self.story_profile_files.append(path)
+        logging.info(f"Story generation profile written to {path}")
+
+    def record_request(self, method: str, path: str, status: int, total_ms: float, phases: Dict[str, float]):
+        if total_ms < self.slow_request_ms:
+            return
+        self.slow_requests.append({
+            "at": datetime.utcnow().isoformat(),
+            "method": method,
+            "path": path,
+            "status": status,
+            "total_ms": round(total_ms, 2),
+            "phases_ms": {name: round(value, 2) for name, value in phases.items()},
+        })
+
+    def register_metrics(self, name: str, provider: Callable[[], dict]):
+        self.metrics_providers[name] = provider
+
+    def status(self) -> dict:
+        return {
+            "sampling": self.sampling.is_running(),
+            "story_profiles_remaining": self.story_profiles_remaining,
+            "story_profile_files": list(self.story_profile_files),
+            "slow_request_ms": self.slow_request_ms,
+            "slow_requests": len(self.slow_requests),
+            "metrics": {name: provider() for name, provider in self.metrics_providers.items()},
+        }
+
+    def dump(self) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"dump-{datetime.utcnow():%Y%m%d-%H%M%S}.json")
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({"status": self.status(), "slow_requests": list(self.slow_requests)}, file, ensure_ascii=False, indent=2)
+        return path
@@ -0,0 +1,70 @@
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Optional
+
+from models.topic_type import TopicType
+
+PRIORITY_ORDER = [TopicType.VIP, TopicType.USER, TopicType.SYSTEM]
+
+
+def parse_topic_type_map(value: str) -> Dict[TopicType, float]:
+    result = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, number = item.split(":", 1)
+        result[TopicType(name.strip().upper())] = float(number)
+    return result
+
+
+class BaseScheduler(ABC):
+    # candidates maps every non-empty class to the created_at of its oldest item
+    @abstractmethod
+    def select(self, candidates: Dict[TopicType, datetime]) -> Optional[TopicType]:
+        pass
+
+    def record(self, topic_type: TopicType):
+        pass
+
+
+class StrictPriorityScheduler(BaseScheduler):
+    def select(self, candidates: Dict[TopicType, datetime]) -> Optional[TopicType]:
+        return next((topic_type for topic_type in PRIORITY_ORDER if topic_type in candidates), None)
+
+
+class WeightedFairScheduler(BaseScheduler):
+    MAX_AGING_STRIDES = 1.0
+
+    def __init__(self, weights: Dict[TopicType, float], aging_seconds: float):
+        if any(weight <= 0 for weight in weights.values()):
+            raise ValueError(f"Scheduler weights must be positive, got {weights}")
+        self.weights = {topic_type: weights.get(topic_type, 1.0) for topic_type in PRIORITY_ORDER}
+        self.aging_seconds = aging_seconds
+        self.passes = {topic_type: 0.0 for topic_type in PRIORITY_ORDER}
+        self.virtual_time = 0.0
+        self.lock = threading.Lock()
+
+    def select(self, candidates: Dict[TopicType, datetime]) -> Optional[TopicType]:
+        if not candidates:
+            return None
+
+        now = datetime.utcnow()
+        with self.lock:
+            # Virtual time follows the most behind backlogged class, so serving a class early never erases another's credit
+            self.virtual_time = max(self.virtual_time, min(self.passes[topic_type] for topic_type in candidates))
+
+            def score(topic_type):
+                # A class that was idle does not get to replay the credit it accumulated meanwhile
+                pass_value = max(self.passes[topic_type], self.virtual_time)
+                if self.aging_seconds > 0 and candidates[topic_type] is not None:
+                    # Buffered items are often hours old, so the bonus is capped or an old class would starve the others
+                    waited_strides = (now - candidates[topic_type]).total_seconds() / self.aging_seconds
+                    pass_value -= min(waited_strides, self.MAX_AGING_STRIDES) / self.weights[topic_type]
+                return pass_value, PRIORITY_ORDER.index(topic_type)
+
+            return min(candidates, key=score)
+
+    def record(self, topic_type: TopicType):
+        with self.lock:
+            self.passes[topic_type] = max(self.passes[topic_type], self.virtual_time) + 1.0 / self.weights[topic_type]
@@ -5,22 +5,36 @@ import shutil
 import time
 import traceback
 from concurrent.futures import ThreadPoolExecutor
-from threading import Semaphore
-from typing import List
+from datetime import datetime
+from threading import Lock, Semaphore, Thread
+from typing import Dict, List, Optional
 
 from bson import ObjectId
 
-from models.config import Config
+from models.compiled_config import CompiledConfig
 from models.story_model import Scenario, StoryModel
+from models.story_status import StoryStatus
 from models.topic import Topic
 from models.topic_type import TopicType
-from repos import StoryRepository, TopicRepository
+from repos import StoryRepository, TopicRepository, UnitOfWork
+from services.demand_tracker import DemandTracker
 from services.openai import OpenAIApi, OpenAIApiException
+from services.profiler import Profiler, profiled
+from services.scheduler import BaseScheduler, StrictPriorityScheduler
+from services.voice.audio_info import get_ogg_duration
 from services.voice.base_tts import BaseTTS
 
 
+class AudioGenerationException(Exception):
+    pass
+
+
+class StoryConsumedException(Exception):
+    pass
+
+
 class StoryGenerator:
-    def __init__(self, openai_client: OpenAIApi, config: Config, voice_generator: BaseTTS, audio_dir: str, max_system_stoies: int, topic_repository: TopicRepository, story_repository: StoryRepository):
+    def __init__(self, openai_client: OpenAIApi, config: CompiledConfig, voice_generator: BaseTTS, audio_dir: str, max_system_stoies: int, topic_repository: TopicRepository, story_repository: StoryRepository, scheduler: Optional[BaseScheduler] = None, buffer_targets: Optional[Dict[TopicType, int]] = None, demand_tracker: Optional[DemandTracker] = None, max_attempts: int = 3, progressive: bool = False, profiler: Optional[Profiler] = None):
         self.config = config
         self.audio_dir = audio_dir
         self.openai_api = openai_client
@@ -28,45 +42,100 @@ class StoryGenerator:
         self.max_system_stoies = max_system_stoies
         self.topic_repository = topic_repository
         self.story_repository = story_repository
+        self.scheduler = scheduler or StrictPriorityScheduler()
+        self.buffer_targets = {TopicType.SYSTEM: max_system_stoies}
+        self.buffer_targets.update(buffer_targets or {})
+        self.demand_tracker = demand_tracker
+        self.max_workers = demand_tracker.max_workers if demand_tracker else 1
+        self.claimed_topics = set()
+        self.in_flight_stories = set()
+        self.claim_lock = Lock()
+        self.max_attempts = max_attempts
+        self.progressive = progressive
+        self.profiler = profiler
         self.delimeter = "::"
 
         if not os.path.exists(self.audio_dir):
             os.makedirs(self.audio_dir)
 
+    def reload_config(self, config: CompiledConfig):
+        # A single reference swap; stories in flight keep the snapshot they started with
+        self.config = config
+
     def generate(self):
+        for worker in range(1, self.max_workers):
+            Thread(target=self._generate_loop, args=(worker,), name=f"story-worker-{worker}", daemon=True).start()
+        self._generate_loop(0)
+
+    def _generate_loop(self, worker: int):
         while True:
-            
+            if worker >= self._worker_target():
+                time.sleep(10)
+                continue
+
             story_id_str = self._next_story_id()
+            config = self.config
+            topic = None
+            output_dir = None
+            profile = None
+            published = False
 
             try:
+                started_at = time.monotonic()
                 logging.info(f"Generation started for {story_id_str}")
                 self._validate_all_audio_directories()
-                topic = self.topic_repository.get_topic_by_priority()
+                topic_heads = self.topic_repository.get_oldest_created_at_by_type()
 
-                if not topic:
+                if not topic_heads:
                     logging.info(f"Not found topics")
                     time.sleep(10)
                     continue
 
-                if topic.topic_type == TopicType.SYSTEM.value and self.story_repository.get_count_by_topic_type(TopicType.SYSTEM) >= self.max_system_stoies:
-                    logging.info(f"Reached the maximum system number of story ({self.max_system_stoies}). Pausing generation...")
+                topic = self._next_topic(topic_heads)
+
+                if not topic:
+                    logging.info(f"No topic available within the story buffer targets {self._format_buffer_targets()}. Pausing generation...")
                     time.sleep(10)
                     continue
 
-                story_text_data = self._generate_story_text(topic.text)
+                if self.profiler:
+                    profile = self.profiler.start_story_profile()
+
+                if topic.story_text:
+                    story_id_str = self._resume_story_id(topic, story_id_str)
+                    story_text_data = self._drop_unvoiced_lines(config, topic.story_text)
+                    resumed_lines = topic.completed_lines
+                    if len(story_text_data) < len(topic.story_text):
+                        # A reloaded config no longer voices some speakers; positions shifted, so the kept lines are voiced again
+                        self.topic_repository.save_story_text(topic.id, story_id_str, story_text_data)
+                        resumed_lines = []
+                    logging.info(f"Resuming {story_id_str} from checkpoint, {len(resumed_lines)}/{len(story_text_data)} lines voiced")
+                else:
+                    story_text_data = self._generate_story_text(config, topic.text)
+                    self.topic_repository.save_story_text(topic.id, story_id_str, story_text_data)
+                    resumed_lines = []
+
                 story_text_data_with_pos = list(enumerate(story_text_data))
                 output_dir = self._create_output_directory(story_id_str)
+                completed_lines = self._remove_incomplete_audio(output_dir, resumed_lines)
 
-                audio_files = self._generate_audio_files(output_dir, story_text_data)
+                if self.progressive:
+                    self._publish_streaming_story(self._build_streaming_story(story_id_str, topic, story_text_data, output_dir, completed_lines, config), topic.completed_lines)
+                    published = True
+
+                audio_files = self._generate_audio_files(output_dir, story_text_data, topic.id, completed_lines, story_id_str, config)
                 audio_files = sorted(audio_files, key=lambda x: x[0])
                 time.sleep(1)
 
+                if published and not self.story_repository.has_story(story_id_str):
+                    raise StoryConsumedException(f"{story_id_str} was played and deleted while it was streaming")
+
                 self._validate_audio_files(output_dir, len(story_text_data))
 
                 story_list = []
                 for pos, audio_file_path in audio_files:
-                    speaker, text = self._parse_line(story_text_data_with_pos[pos][1])
-                    story_list.append(Scenario(character=speaker, text=text, sound=audio_file_path))
+                    speaker, text = self._parse_line(story_text_data_with_pos[pos][1], config)
+                    story_list.append(Scenario(character=speaker, text=text, sound=audio_file_path, duration=get_ogg_duration(audio_file_path)))
 
                 logging.debug(story_list)
                     
@@ -79,35 +148,183 @@ class StoryGenerator:
                 )
                 
                 logging.debug(story)
-                self.story_repository.create_story(story)
-                self.topic_repository.delete_topic(topic.id)
+                self.topic_repository.flush_writes()
+                self.story_repository.flush_writes()
+                with UnitOfWork(self.story_repository.collection.database.client) as unit_of_work:
+                    if self.progressive:
+                        self.story_repository.update_story_content(story, unit_of_work)
+                    else:
+                        self.story_repository.create_story(story, unit_of_work)
+                    self.topic_repository.delete_topic(topic.id, unit_of_work)
+
+                if self.demand_tracker:
+                    self.demand_tracker.record_generation(time.monotonic() - started_at)
                 
             except OpenAIApiException as e:
                 logging.error(e)
                 time.sleep(30)
             
+            except StoryConsumedException as e:
+                logging.info(f"{e}, dropping its topic")
+                self._drop_consumed_story(topic, output_dir)
+
+            except AudioGenerationException as e:
+                # TTS failures are transient, the checkpointed text is kept and only the missing lines are voiced again
+                logging.error(f"Audio generation failed: {e}")
+                self._record_failed_attempt(topic, output_dir, story_id_str, published)
+                time.sleep(10)
+
             except ValueError as e:
                 logging.error(f"Value error: {e}. Skipping current topic.")
-                self.topic_repository.delete_topic(topic.id)
+                self.safe_remove_directory(output_dir)
+                if self.progressive:
+                    self.story_repository.delete_story(story_id_str)
+                if topic:
+                    self.topic_repository.delete_topic(topic.id)
 
             except Exception as e:
                 logging.error(f"An error occurred while generating: {e}, Aborting")
                 logging.error(f"Exception type: {type(e).__name__}")
                 logging.error(f"Exception message: {e}")
                 logging.error(f"Stack trace: {traceback.format_exc()}")
-                self.safe_remove_directory(output_dir)
+                self._record_failed_attempt(topic, output_dir, story_id_str, published)
                 time.sleep(10)
             
             finally:
+                if profile:
+                    self.profiler.finish_story_profile(profile, story_id_str)
+                self._release(topic, story_id_str)
                 logging.info("Generation finished")
 
+    def _next_topic(self, topic_heads: Dict[TopicType, datetime]) -> Optional[Topic]:
+        # Topics with a saved checkpoint go first so their paid LLM text is not left behind
+        with self.claim_lock:
+            topic = self.topic_repository.get_checkpointed_topic(self.claimed_topics)
+            if topic:
+                self.claimed_topics.add(topic.id)
+                return topic
+
+        candidates = {topic_type: created_at for topic_type, created_at in topic_heads.items() if not self._is_buffer_full(topic_type)}
+        topic_type = self.scheduler.select(candidates)
+        if topic_type is None:
+            return None
+
+        with self.claim_lock:
+            topic = self.topic_repository.get_oldest_topic_by_type(topic_type, self.claimed_topics)
+            if topic:
+                self.claimed_topics.add(topic.id)
+        if topic:
+            self.scheduler.record(topic_type)
+        return topic
+
+    def _release(self, topic: Optional[Topic], story_id: str):
+        with self.claim_lock:
+            if topic:
+                self.claimed_topics.discard(topic.id)
+            self.in_flight_stories.discard(story_id)
+
+    def _resume_story_id(self, topic: Topic, story_id: str) -> str:
+        with self.claim_lock:
+            self.in_flight_stories.discard(story_id)
+            self.in_flight_stories.add(topic.story_id)
+        return topic.story_id
+
+    def _remove_incomplete_audio(self, output_dir: str, completed_lines: List[int]) -> set:
+        completed_files = {f"{pos}.ogg" for pos in completed_lines}
+        for file_name in os.listdir(output_dir):
+            if file_name not in completed_files:
+                os.remove(os.path.join(output_dir, file_name))
+        return {pos for pos in completed_lines if os.path.exists(os.path.join(output_dir, f"{pos}.ogg"))}
+
+    def _record_failed_attempt(self, topic: Optional[Topic], output_dir: Optional[str], story_id: str, published: bool = False):
+        if topic is None:
+            self.safe_remove_directory(output_dir)
+            return
+
+        # Deleting a streaming story also removes its audio directory, which fails the voicing in progress
+        if published and not self.story_repository.has_story(story_id):
+            logging.info(f"{story_id} was played and deleted while it was streaming, dropping its topic")
+            self._drop_consumed_story(topic, output_dir)
+            return
+
+        attempts = self.topic_repository.increment_attempts(topic.id)
+        if attempts >= self.max_attempts:
+            logging.error(f"Giving up on topic {topic.id} after {attempts} attempts")
+            self.safe_remove_directory(output_dir)
+            if self.progressive:
+                self.story_repository.delete_story(story_id)
+            self.topic_repository.delete_topic(topic.id)
+        else:
+            logging.info(f"Keeping checkpoint of topic {topic.id} for retry ({attempts}/{self.max_attempts})")
+
+    def _publish_streaming_story(self, story: StoryModel, voiced_lines: List[int]):
+        if self.story_repository.has_story(story.id):
+            self.story_repository.update_story_content(story)
+        elif voiced_lines:
+            # Streaming stories are served once their first line is voiced, so a missing one was already played and deleted
+            raise StoryConsumedException(f"{story.id} was played and deleted before generation resumed")
+        else:
+            self.story_repository.create_story(story)
+
+    def _drop_consumed_story(self, topic: Topic, output_dir: Optional[str]):
+        self.safe_remove_directory(output_dir)
+        self.topic_repository.delete_topic(topic.id)
+
+    def _build_streaming_story(self, story_id: str, topic: Topic, story_text_data: List[str], output_dir: str, completed_lines: set, config: CompiledConfig) -> StoryModel:
+        story_list = []
+        for pos, line in enumerate(story_text_data):
+            speaker, text = self._parse_line(line, config)
+            audio_file_path = os.path.join(output_dir, f"{pos}.ogg")
+            ready = pos in completed_lines
+            story_list.append(Scenario(character=speaker, text=text, sound=audio_file_path, duration=get_ogg_duration(audio_file_path) if ready else None, ready=ready))
+
+        return StoryModel(
+            _id=story_id,
+            topic_type=topic.topic_type,
+            requestor_name=topic.requestor_name,
+            topic=topic.text,
+            scenario=story_list,
+            status=StoryStatus.STREAMING.value
+        )
+
+    def _on_line_done(self, topic_id: Optional[str], story_id: Optional[str], pos: int, audio_file_path: Optional[str]):
+        if not audio_file_path or not os.path.exists(audio_file_path):
+            return
+        if topic_id:
+            self.topic_repository.mark_line_done(topic_id, pos)
+        if self.progressive and story_id:
+            self.story_repository.mark_line_ready(story_id, pos, get_ogg_duration(audio_file_path))
+
+    def _worker_target(self) -> int:
+        return self.demand_tracker.worker_target() if self.demand_tracker else 1
+
+    def _buffer_target(self, topic_type: TopicType) -> Optional[int]:
+        if topic_type == TopicType.SYSTEM and self.demand_tracker:
+            return self.demand_tracker.system_buffer_target()
+        return self.buffer_targets.get(topic_type)
+
+    def _is_buffer_full(self, topic_type: TopicType) -> bool:
+        target = self._buffer_target(topic_type)
+        if target is None:
+            return False
+        return self.story_repository.get_count_by_topic_type(topic_type) >= target
+
+    def _format_buffer_targets(self) -> str:
+        return ", ".join(f"{topic_type.value}={self._buffer_target(topic_type)}" for topic_type in self.buffer_targets)
+
     def _next_story_id(self) -> str:
-        return str(ObjectId())
+        story_id = str(ObjectId())
+        with self.claim_lock:
+            self.in_flight_stories.add(story_id)
+        return story_id
     
     def _validate_all_audio_directories(self):
         for subdirectory in os.listdir(self.audio_dir):
             full_subdirectory_path = os.path.join(self.audio_dir, subdirectory)
             
+            if subdirectory in self.in_flight_stories:
+                continue
+
             if os.path.isdir(full_subdirectory_path):
                 if not os.listdir(full_subdirectory_path):
                     logging.warning(f"Empty directory detected: {full_subdirectory_path}. Deleting directory.")
@@ -120,13 +337,26 @@ class StoryGenerator:
 
         return output_dir
 
-    def _generate_story_text(self, topic_text: str) -> str:
-        scenario = self.openai_api.generate_text(self.config.system_prompt, topic_text)
+    def _generate_story_text(self, config: CompiledConfig, topic_text: str) -> str:
+        scenario = self.openai_api.generate_text(config.system_prompt, topic_text)
         if scenario is None or len(scenario) < 1:
             raise ValueError(f"story text is empty \"{scenario}\"")
         
         scenario = [s.replace(":", self.delimeter, 1) for s in scenario]
-        return self._normalize_scenario(scenario)
+        return self._drop_unvoiced_lines(config, self._normalize_scenario(scenario))
+
+    def _drop_unvoiced_lines(self, config: CompiledConfig, scenario: List[str]) -> List[str]:
+        # One invented speaker should not cost the whole story, so its lines are dropped before the text is checkpointed
+        lines = []
+        for line in scenario:
+            speaker, _ = self._parse_line(line, config)
+            if config.get_voice_id(speaker) is None:
+                logging.warning(f"Dropping line of unknown speaker \"{speaker}\": {line}")
+            else:
+                lines.append(line)
+        if not lines:
+            raise ValueError(f"No line of the story text has a known speaker: {scenario}")
+        return lines
 
     def _normalize_scenario(self, scenario: List[str]) -> List[str]:
         scenario = '\n'.join(scenario)
@@ -134,7 +364,8 @@ class StoryGenerator:
         scenario = re.sub(r'^\*\(.*\)\*$', '', scenario, flags=re.MULTILINE)
         scenario = re.sub(r'^\*.*\*$', '', scenario, flags=re.MULTILINE)
         scenario = re.sub(r'^\(.*\)$', '', scenario, flags=re.MULTILINE)
-        scenario = re.sub(r'^(?![\w\s]+::).*$', '', scenario, flags=re.MULTILINE)
+        # Speaker names may carry punctuation ("ГУБКА-БОБ", "Мистер Крабс."), they are resolved against the config later
+        scenario = re.sub(r'^(?![^:\n]+::).*$', '', scenario, flags=re.MULTILINE)
         scenario = re.sub(r'\n+', '\n', scenario).strip()
         return scenario.split('\n')
 
@@ -143,8 +374,10 @@ class StoryGenerator:
             if self.delimeter not in line:
                 raise ValueError(f"Invalid story text format: \"{line}\"")
 
-    def _generate_audio_files(self, output_dir: str, dialog: str):
+    def _generate_audio_files(self, output_dir: str, dialog: str, topic_id: Optional[str] = None, completed_lines: set = frozenset(), story_id: Optional[str] = None, config: Optional[CompiledConfig] = None):
+        config = config or self.config
         futures = []
+        results = []
         semaphore = Semaphore(0)
         timeout = 5
 
@@ -152,30 +385,44 @@ class StoryGenerator:
             try:
                 result = future.result()
                 logging.info(f"Process audio thread done: {result}")
+                self._on_line_done(topic_id, story_id, *result)
                 semaphore.release()
             except Exception as e:
                 logging.error(f"An error occurred in future: {e}")
                 semaphore.release()
 
+        # Lines of unknown speakers were already dropped by _drop_unvoiced_lines
+        lines = [self._parse_line(line, config) for line in dialog]
+
         with ThreadPoolExecutor() as executor:
-            for pos, line in enumerate(dialog):
-                logging.info(f"Process audio for string: {line}")
-                speaker, text = self._parse_line(line)
-                voice_id = self._get_voice_id(speaker)
+            for pos, (speaker, text) in enumerate(lines):
+                logging.info(f"Process audio for string: {dialog[pos]}")
+
+                if pos in completed_lines:
+                    results.append((pos, os.path.join(output_dir, f"{pos}.ogg")))
+                    continue
 
-                if voice_id:
-                    future = executor.submit(self.voice_generator.generate_voice, text, voice_id, output_dir, pos)
-                    future.add_done_callback(when_done)
-                    futures.append(future)
+                future = executor.submit(profiled(self.voice_generator.generate_voice), text, config.get_voice_id(speaker), output_dir, pos)
+                future.add_done_callback(when_done)
+                futures.append(future)
 
         try:
-            for _ in range(len(dialog)):
+            for _ in range(len(futures)):
                 semaphore.acquire(timeout=timeout)
         except TimeoutError as e:
             logging.error(f"Timed out waiting for futures to complete after {timeout} seconds.")
             raise e
 
-        return [future.result() for future in futures]
+        for future in futures:
+            try:
+                pos, audio_file_path = future.result()
+            except Exception as e:
+                raise AudioGenerationException(f"Voicing a line failed: {e}") from e
+            if not audio_file_path or not os.path.exists(audio_file_path):
+                raise AudioGenerationException(f"Line {pos} was not voiced")
+            results.append((pos, audio_file_path))
+
+        return results
 
     def _validate_audio_files(self, output_dir: str, expected_count: int):
         all_files_in_dir = os.listdir(output_dir)
@@ -185,20 +432,18 @@ class StoryGenerator:
 
         if actual_count != expected_count:
             logging.error(f"Mismatched audio files count. Expected: {expected_count}, Got: {actual_count}")
-            raise ValueError("Mismatched audio files count")
+            raise AudioGenerationException("Mismatched audio files count")
 
-    def _parse_line(self, line):
+    def _parse_line(self, line, config: Optional[CompiledConfig] = None):
         parts = line.split(self.delimeter)
         if len(parts) < 2:
             raise ValueError(f"Invalid line format: {line}")
-        return parts[0].strip(), parts[1].strip()
-
-    def _get_voice_id(self, speaker):
-        return next((char.voice for char in self.config.dialogue_data.characters if char.name == speaker), None)
+        speaker = parts[0].strip()
+        return (config or self.config).get_character_name(speaker) or speaker, parts[1].strip()
     
     def safe_remove_directory(self, path):
         try:
-            if os.path.exists(path):
+            if path and os.path.exists(path):
                 shutil.rmtree(path)
         except Exception as e:
             logging.error(f"Error while removing directory {path}: {e}")
@@ -0,0 +1,148 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import threading
+from typing import List, Optional
+
+from models.story_model import Scenario, StoryModel
+from models.topic_type import TopicType
+from repos import StoryRepository
+
+PACK_MAGIC = b"SPK1"
+PACK_HEADER = struct.Struct("<4sQ")
+PACK_AUDIO_PREFIX = "pack"
+
+
+def build_story_pack(story_repository: StoryRepository, output_path: str, limit: int = 0) -> int:
+    entries = []
+    clip_paths = []
+    offset = 0
+
+    for story_id in story_repository.get_story_ids(limit=limit):
+        story = story_repository.get_story(story_id)
+        if story is None or not story.scenario:
+            continue
+        paths = [os.path.join(os.getcwd(), line.sound) for line in story.scenario]
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            logging.warning(f"Skipping story {story_id}: missing audio {missing}")
+            continue
+
+        scenario = []
+        for line, path in zip(story.scenario, paths):
+            size = os.path.getsize(path)
+            scenario.append({"character": line.character, "text": line.text, "duration": line.duration, "offset": offset, "size": size})
+            clip_paths.append(path)
+            offset += size
+
+        entries.append({"id": story.id, "requestor_name": story.requestor_name, "topic": story.topic, "scenario": scenario})
+
+    index = json.dumps({"version": 1, "stories": entries}, ensure_ascii=False).encode('utf-8')
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'wb') as pack_file:
+        pack_file.write(PACK_HEADER.pack(PACK_MAGIC, len(index)))
+        pack_file.write(index)
+        for path in clip_paths:
+            with open(path, 'rb') as clip_file:
+                shutil.copyfileobj(clip_file, pack_file)
+    os.replace(tmp_path, output_path)
+
+    logging.info(f"Story pack {output_path} built with {len(entries)} stories, {offset} bytes of audio")
+    return len(entries)
+
+
+class StoryPack:
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, index_length = PACK_HEADER.unpack_from(self.mm, 0)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{path} is not a story pack")
+        index = json.loads(self.mm[PACK_HEADER.size:PACK_HEADER.size + index_length].decode('utf-8'))
+        self.data_offset = PACK_HEADER.size + index_length
+        self.stories: List[dict] = index["stories"]
+        self.stories_by_id = {story["id"]: story for story in self.stories}
+        self.cursor = 0
+        self.lock = threading.Lock()
+        logging.info(f"Story pack {path} loaded with {len(self.stories)} stories")
+
+    def has_story(self, story_id: str) -> bool:
+        return story_id in self.stories_by_id
+
+    def next_story(self) -> Optional[StoryModel]:
+        if not self.stories:
+            return None
+        with self.lock:
+            entry = self.stories[self.cursor % len(self.stories)]
+        return self._to_story_model(entry)
+
+    def get_story(self, story_id: str) -> Optional[StoryModel]:
+        entry = self.stories_by_id.get(story_id)
+        return self._to_story_model(entry) if entry else None
+
+    def mark_played(self, story_id: str):
+        # Pack stories are never deleted, playback just moves on to the next one
+        with self.lock:
+            if self.stories and self.stories[self.cursor % len(self.stories)]["id"] == story_id:
+                self.cursor += 1
+
+    def read_clip(self, story_id: str, pos: int) -> Optional[bytes]:
+        entry = self.stories_by_id.get(story_id)
+        if entry is None or not 0 <= pos < len(entry["scenario"]):
+            return None
+        line = entry["scenario"][pos]
+        start = self.data_offset + line["offset"]
+        return self.mm[start:start + line["size"]]
+
+    def _to_story_model(self, entry: dict) -> StoryModel:
+        scenario = [
+            Scenario(character=line["character"], text=line["text"], sound=f"{PACK_AUDIO_PREFIX}/{self.name}/{entry['id']}/{pos}.ogg", duration=line["duration"])
+            for pos, line in enumerate(entry["scenario"])
+        ]
+        return StoryModel(
+            _id=entry["id"],
+            topic_type=TopicType.SYSTEM.value,
+            requestor_name=entry["requestor_name"],
+            topic=entry["topic"],
+            scenario=scenario
+        )
+
+
+def load_story_pack(pack_dir: str, config_name: str) -> Optional[StoryPack]:
+    path = os.path.join(pack_dir, f"{config_name}.spk")
+    if not os.path.exists(path):
+        return None
+    return StoryPack(config_name, path)
+
+
+def main():
+    from dotenv import load_dotenv
+    from main import create_mongo_client
+
+    parser = argparse.ArgumentParser(description="Build a story pack from the stories stored for a config")
+    parser.add_argument("config_name")
+    parser.add_argument("--output", help="pack path, defaults to <STORY_PACK_DIR>/<config_name>.spk")
+    parser.add_argument("--limit", type=int, default=0, help="maximum number of stories, 0 for all")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    pack_dir = os.getenv("STORY_PACK_DIR", "packs")
+    output_path = args.output or os.path.join(pack_dir, f"{args.config_name}.spk")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    mongo_db = create_mongo_client()[f'{args.config_name}_scenarios_db']
+    story_repository = StoryRepository(os.path.join("audio", args.config_name), mongo_db['stories'])
+    build_story_pack(story_repository, output_path, args.limit)
+
+
+if __name__ == "__main__":
+    main()
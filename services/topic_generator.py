@@ -11,21 +11,26 @@ from repos.topic_repository import TopicRepository
 
 
 class TopicGenerator:
-    def __init__(self, dialogue_data: DialogueData, max_system_topics, topic_repository: TopicRepository):
+    def __init__(self, dialogue_data: DialogueData, max_system_topics, topic_repository: TopicRepository, batch_size: int = 10):
         self.dialogue_data = dialogue_data
         self.max_system_topics = max_system_topics
         self.topic_repository = topic_repository
+        self.batch_size = batch_size
+
+    def reload_dialogue_data(self, dialogue_data: DialogueData):
+        self.dialogue_data = dialogue_data
 
     def _generate_topic_text(self) -> str:
-        theme_template = random.choice(self.dialogue_data.themes)
-        participants = [character.name for character in self.dialogue_data.characters]
+        dialogue_data = self.dialogue_data
+        theme_template = random.choice(dialogue_data.themes)
+        participants = [character.name for character in dialogue_data.characters]
         num_participants = random.randint(2, len(participants))
         chosen_participants = random.sample(participants, num_participants)
 
-        chosen_mood = random.choice(self.dialogue_data.emotions)
-        chosen_action = random.choice(self.dialogue_data.actions)
-        chosen_topic = random.choice(self.dialogue_data.topics)
-        chosen_interaction = random.choice(self.dialogue_data.interactions)
+        chosen_mood = random.choice(dialogue_data.emotions)
+        chosen_action = random.choice(dialogue_data.actions)
+        chosen_topic = random.choice(dialogue_data.topics)
+        chosen_interaction = random.choice(dialogue_data.interactions)
 
         topic = theme_template.format(
             character1=chosen_participants[0],
@@ -41,18 +46,23 @@ class TopicGenerator:
 
     def generate(self):
         while True:
-            if self.topic_repository.get_total_count() >= self.max_system_topics:
+            missing_count = self.max_system_topics - self.topic_repository.get_total_count()
+            if missing_count <= 0:
                 logging.info(f"Reached the maximum number of system topics ({self.max_system_topics}). Pausing generation...")
                 time.sleep(10)
                 continue
 
-            topic_text = self._generate_topic_text()
-            topic = Topic(
-                _id=str(ObjectId()),
-                topic_type=TopicType.SYSTEM.value,
-                requestor_name=TopicType.SYSTEM.value,
-                text=topic_text
-            )
-            self.topic_repository.create_topic(topic)
-            logging.info(f"Generated and saved new theme: {topic_text}")
+            topics = []
+            for _ in range(min(missing_count, self.batch_size)):
+                topic_text = self._generate_topic_text()
+                topics.append(Topic(
+                    _id=str(ObjectId()),
+                    topic_type=TopicType.SYSTEM.value,
+                    requestor_name=TopicType.SYSTEM.value,
+                    text=topic_text
+                ))
+                logging.info(f"Generated new theme: {topic_text}")
+
+            self.topic_repository.create_topics(topics)
+            logging.info(f"Saved {len(topics)} new themes")
             
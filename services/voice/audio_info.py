@@ -0,0 +1,40 @@
+import os
+import struct
+from typing import Optional
+
+OGG_TAIL_BYTES = 65536
+
+
+def get_ogg_duration(path: str) -> Optional[float]:
+    # Reads the codec sample rate from the first page and the granule position of the last page
+    try:
+        with open(path, 'rb') as file:
+            head = file.read(512)
+            file_size = os.fstat(file.fileno()).st_size
+            file.seek(max(0, file_size - OGG_TAIL_BYTES))
+            tail = file.read()
+    except OSError:
+        return None
+
+    if not head.startswith(b'OggS'):
+        return None
+
+    sample_rate = _get_sample_rate(head)
+    last_page = tail.rfind(b'OggS')
+    if sample_rate is None or last_page < 0 or len(tail) < last_page + 14:
+        return None
+
+    granule_position = struct.unpack_from('<q', tail, last_page + 6)[0]
+    if granule_position < 0:
+        return None
+    return granule_position / sample_rate
+
+
+def _get_sample_rate(head: bytes) -> Optional[int]:
+    vorbis_header = head.find(b'\x01vorbis')
+    if vorbis_header >= 0 and len(head) >= vorbis_header + 16:
+        return struct.unpack_from('<I', head, vorbis_header + 12)[0]
+    # Opus granule positions are always counted at 48 kHz
+    if head.find(b'OpusHead') >= 0:
+        return 48000
+    return None
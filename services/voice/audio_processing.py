@@ -0,0 +1,94 @@
+from typing import Optional, Tuple
+
+import numpy as np
+from pydub import AudioSegment
+
+
+class AudioPostProcessor:
+    def __init__(self, target_sample_rate: Optional[int] = None, trim_silence: bool = True, silence_threshold_db: float = -45, padding_ms: int = 50, target_rms_db: Optional[float] = -20, peak_limit: float = 0.98):
+        self.target_sample_rate = target_sample_rate
+        self.trim_silence = trim_silence
+        self.silence_threshold_db = silence_threshold_db
+        self.padding_ms = padding_ms
+        self.target_rms_db = target_rms_db
+        self.peak_limit = peak_limit
+        self.frame_ms = 10
+
+    def process_segment(self, segment: AudioSegment) -> AudioSegment:
+        scale = float(1 << (8 * segment.sample_width - 1))
+        samples = np.array(segment.get_array_of_samples(), dtype=np.float32) / scale
+        if segment.channels > 1:
+            samples = samples.reshape(-1, segment.channels).mean(axis=1)
+
+        samples, sample_rate = self.process(samples, segment.frame_rate)
+        data = (np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes()
+        return AudioSegment(data=data, sample_width=2, frame_rate=sample_rate, channels=1)
+
+    def process(self, samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, int]:
+        if self.trim_silence:
+            samples = self.trim(samples, sample_rate)
+        if self.target_rms_db is not None:
+            samples = self.normalize(samples)
+        if self.target_sample_rate and self.target_sample_rate != sample_rate:
+            samples = self.resample(samples, sample_rate, self.target_sample_rate)
+            sample_rate = self.target_sample_rate
+        return samples, sample_rate
+
+    def trim(self, samples: np.ndarray, sample_rate: int) -> np.ndarray:
+        frame_size = max(1, sample_rate * self.frame_ms // 1000)
+        frames_count = len(samples) // frame_size
+        if frames_count == 0:
+            return samples
+
+        frames = samples[:frames_count * frame_size].reshape(frames_count, frame_size)
+        frame_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+        voiced = np.flatnonzero(frame_db > self.silence_threshold_db)
+        if len(voiced) == 0:
+            return samples
+
+        padding = sample_rate * self.padding_ms // 1000
+        start = max(0, voiced[0] * frame_size - padding)
+        end = min(len(samples), (voiced[-1] + 1) * frame_size + padding)
+        return samples[start:end]
+
+    def normalize(self, samples: np.ndarray) -> np.ndarray:
+        if len(samples) == 0:
+            return samples
+
+        rms = np.sqrt(np.mean(samples * samples))
+        peak = np.max(np.abs(samples))
+        if rms == 0 or peak == 0:
+            return samples
+
+        gain = 10 ** (self.target_rms_db / 20) / rms
+        # Never push peaks into clipping to reach the loudness target
+        gain = min(gain, self.peak_limit / peak)
+        return samples * gain
+
+    def resample(self, samples: np.ndarray, sample_rate: int, target_sample_rate: int) -> np.ndarray:
+        if len(samples) == 0:
+            return samples
+
+        if target_sample_rate < sample_rate:
+            samples = self._lowpass(samples, target_sample_rate / sample_rate)
+
+        duration = len(samples) / sample_rate
+        target_length = int(round(duration * target_sample_rate))
+        source_positions = np.arange(target_length) * (sample_rate / target_sample_rate)
+        return np.interp(source_positions, np.arange(len(samples)), samples).astype(np.float32)
+
+    @classmethod
+    def _lowpass(cls, samples: np.ndarray, ratio: float) -> np.ndarray:
+        # mode='same' returns max(len(samples), taps) values, so clips shorter than the kernel would grow.
+        # The full convolution is cut back to the input length around the kernel's center instead.
+        kernel = cls._lowpass_kernel(ratio)
+        offset = (len(kernel) - 1) // 2
+        return np.convolve(samples, kernel, mode='full')[offset:offset + len(samples)]
+
+    @staticmethod
+    def _lowpass_kernel(ratio: float, taps: int = 63) -> np.ndarray:
+        # Windowed-sinc anti-aliasing filter with the cutoff at the new Nyquist frequency
+        cutoff = 0.5 * ratio
+        n = np.arange(taps) - (taps - 1) / 2
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+        return (kernel / kernel.sum()).astype(np.float32)
@@ -6,15 +6,25 @@ class BaseTTS(ABC):
     def __init__(self):
         if not self.SUPPORTED_VOICES:
             raise NotImplementedError("The SUPPORTED_VOICES list must be populated in the subclass.")
+        self.post_processor = None
         
     @abstractmethod
     def generate_voice(self, text: str, voice_id: str, output_dir: str, pos: int):
         if not self.is_voice_supported(voice_id):
             raise ValueError(f"The voice '{voice_id}' is not supported. Choose from {self.SUPPORTED_VOICES}.")
         
+    def postprocess(self, audio):
+        if self.post_processor is None:
+            return audio
+        return self.post_processor.process_segment(audio)
+
     def is_voice_supported(self, voice_id):
         return voice_id in self.SUPPORTED_VOICES
 
     @property
     def supported_voices(self):
         return self.SUPPORTED_VOICES
+
+    @property
+    def metrics(self) -> dict:
+        return {}
@@ -0,0 +1,42 @@
+import importlib
+import logging
+from importlib.metadata import entry_points
+from typing import Dict, Type
+
+from .base_tts import BaseTTS
+
+ENTRY_POINT_GROUP = "scenario_ai.tts_backends"
+
+# Backends are referenced by import path so that only the configured one gets imported
+TTS_BACKENDS: Dict[str, str] = {
+    "YandexTTS": "services.voice.yandex_tts:YandexTTS",
+    "SileroTTS": "services.voice.silero_tts:SileroTTS",
+}
+
+
+def register_tts_backend(name: str, target: str):
+    TTS_BACKENDS[name] = target
+
+
+def load_tts_backend(name: str) -> Type[BaseTTS]:
+    target = TTS_BACKENDS.get(name) or _find_entry_point(name)
+    if target is None and ":" in name:
+        target = name
+    if target is None:
+        raise ValueError(f"Unknown voice generator \"{name}\". Choose from {sorted(TTS_BACKENDS)} or register a \"{ENTRY_POINT_GROUP}\" entry point.")
+
+    module_name, class_name = target.split(":", 1)
+    logging.info(f"Loading voice generator {name} from {module_name}")
+    tts_class = getattr(importlib.import_module(module_name), class_name)
+    if not issubclass(tts_class, BaseTTS):
+        raise ValueError(f"Voice generator {target} must inherit from BaseTTS")
+    return tts_class
+
+
+def _find_entry_point(name: str):
+    all_entry_points = entry_points()
+    if hasattr(all_entry_points, "select"):
+        group = all_entry_points.select(group=ENTRY_POINT_GROUP)
+    else:
+        group = all_entry_points.get(ENTRY_POINT_GROUP, [])
+    return next((entry_point.value for entry_point in group if entry_point.name == name), None)
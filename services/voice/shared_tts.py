@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict, deque
+
+from .base_tts import BaseTTS
+
+
+class FairSemaphore:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self.lock = threading.Lock()
+        self.waiters = OrderedDict()
+
+    def acquire(self, owner: str):
+        with self.lock:
+            if self.in_use < self.capacity and not self.waiters:
+                self.in_use += 1
+                return
+            event = threading.Event()
+            self.waiters.setdefault(owner, deque()).append(event)
+        event.wait()
+
+    def release(self):
+        with self.lock:
+            if not self.waiters:
+                self.in_use -= 1
+                return
+            # Hand the slot to the next owner in round-robin order
+            owner, queue = next(iter(self.waiters.items()))
+            event = queue.popleft()
+            if queue:
+                self.waiters.move_to_end(owner)
+            else:
+                del self.waiters[owner]
+            event.set()
+
+
+class TenantTTS(BaseTTS):
+    def __init__(self, engine: BaseTTS, tenant: str, slots: FairSemaphore):
+        self.SUPPORTED_VOICES = engine.supported_voices
+        super().__init__()
+        self.engine = engine
+        self.tenant = tenant
+        self.slots = slots
+
+    @property
+    def metrics(self) -> dict:
+        return self.engine.metrics
+
+    def generate_voice(self, text: str, voice_id: str, output_dir: str, pos: int):
+        super().generate_voice(text, voice_id, output_dir, pos)
+        self.slots.acquire(self.tenant)
+        try:
+            return self.engine.generate_voice(text, voice_id, output_dir, pos)
+        finally:
+            self.slots.release()
@@ -4,7 +4,9 @@ import torch
 import wave
 import timeit
 import logging
+import threading
 from datetime import datetime, timedelta
+from queue import Queue
 from num2words import num2words
 from ..translit import Translit
 
@@ -81,14 +83,20 @@ class Stats:
         self.wave_data_current = 0
 
 class SileroTTSGenerator:
-    def __init__(self):
+    BENCHMARK_TEXT = "Привет! Это короткая проверка скорости синтеза речи на этом сервере."
+    BENCHMARK_SPEAKER = 'baya'
+
+    def __init__(self, num_threads=2, optimization="none", max_instances=1):
         self.model_id = 'v3_1_ru'
         self.language = 'ru'
         self.put_accent = True
         self.put_yo = True
         self.sample_rate = 48000
         self.torch_device = 'auto'
-        self.torch_num_threads = 2
+        self.torch_num_threads = num_threads
+        self.optimization = optimization
+        self.max_instances = max_instances
+        self.metrics = {}
         self.line_length_limits = {
             'aidar': 870,
             'baya': 860,
@@ -102,8 +110,26 @@ class SileroTTSGenerator:
         self.wave_header_size = 44
         self.wave_sample_width = int(16 / 8)
         self.download_models_config()
-        self.tts_model = self.init_model(self.torch_device, self.torch_num_threads)
         self.translit = Translit()
+        self.tts_model = self.init_model(self.torch_device, self.torch_num_threads if self.torch_num_threads != "auto" else 1)
+
+        instances = 1
+        if self.torch_num_threads == "auto":
+            if self.is_cuda:
+                self.torch_num_threads = 1
+            else:
+                self.torch_num_threads, instances = self.tune_cpu(self.tts_model)
+            torch.set_num_threads(self.torch_num_threads)
+
+        # A single model is shared by concurrent syntheses as before; extra instances are checked out of a pool
+        self.model_pool = None
+        if instances > 1:
+            self.model_pool = Queue()
+            self.model_pool.put(self.tts_model)
+            for _ in range(1, instances):
+                self.model_pool.put(self.init_model(self.torch_device, self.torch_num_threads))
+        self.metrics.update({"threads": self.torch_num_threads, "instances": instances, "optimization": self.optimization})
+        logging.info(f"Silero ready: {instances} instance(s) x {self.torch_num_threads} thread(s), optimization={self.optimization}")
 
     def init_model(self, device, threads_count):
         logging.info("Initializing model")
@@ -113,7 +139,8 @@ class SileroTTSGenerator:
 
         if not torch.cuda.is_available() and device == "auto":
             device = 'cpu'
-        if torch.cuda.is_available() and device == "auto" or device == "cuda":
+        self.is_cuda = torch.cuda.is_available() and device == "auto" or device == "cuda"
+        if self.is_cuda:
             torch_dev = torch.device("cuda", 0)
             gpus_count = torch.cuda.device_count()
             logging.info("Using {} GPU(s)...".format(gpus_count))
@@ -128,6 +155,9 @@ class SileroTTSGenerator:
         tts_model.to(torch_dev)
         logging.info("Model to device takes {:.2f}".format(timeit.default_timer() - t1))
 
+        if not self.is_cuda:
+            tts_model = self.optimize_model(tts_model)
+
         if torch.cuda.is_available() and device == "auto" or device == "cuda":
             logging.info("Synchronizing CUDA")
             t2 = timeit.default_timer()
@@ -136,6 +166,86 @@ class SileroTTSGenerator:
         logging.info("Model is loaded")
         return tts_model
     
+    def optimize_model(self, tts_model):
+        # The hub object wraps a TorchScript module; both passes work on that module and fall back to it on any failure
+        script_module = getattr(tts_model, 'model', None)
+        if self.optimization == "none" or script_module is None:
+            return tts_model
+
+        t0 = timeit.default_timer()
+        try:
+            if self.optimization == "quantize":
+                # quantize_dynamic swaps eager nn.Linear children and silently does nothing to a TorchScript module
+                if isinstance(script_module, torch.jit.ScriptModule):
+                    tts_model.model = torch.quantization.quantize_dynamic_jit(script_module, {'': torch.quantization.default_dynamic_qconfig})
+                else:
+                    tts_model.model = torch.quantization.quantize_dynamic(script_module, {torch.nn.Linear}, dtype=torch.qint8)
+                if not self.is_quantized(tts_model.model):
+                    raise RuntimeError("quantization left every layer of the model unchanged")
+            elif self.optimization == "freeze":
+                tts_model.model = torch.jit.freeze(script_module.eval())
+            else:
+                logging.warning(f"Unknown Silero optimization \"{self.optimization}\", using the model as is")
+                return tts_model
+            # Some failures of an optimized graph only show up at inference time
+            self.synthesize_benchmark(tts_model)
+            logging.info("Model {} takes {:.2f}".format(self.optimization, timeit.default_timer() - t0))
+        except Exception as e:
+            logging.warning(f"Silero optimization \"{self.optimization}\" is not supported by this model: {e}")
+            tts_model.model = script_module
+            self.optimization = "none"
+        return tts_model
+
+    @staticmethod
+    def is_quantized(module) -> bool:
+        if isinstance(module, torch.jit.ScriptModule):
+            return "quantized::" in str(module.inlined_graph)
+        return any("quantized" in type(child).__module__ for child in module.modules())
+
+    def synthesize_benchmark(self, tts_model):
+        text = self.preprocess_text([self.BENCHMARK_TEXT], self.line_length_limits[self.BENCHMARK_SPEAKER])[0][0]
+        with torch.inference_mode():
+            return tts_model.apply_tts(text=text, speaker=self.BENCHMARK_SPEAKER, sample_rate=self.sample_rate, put_accent=self.put_accent, put_yo=self.put_yo)
+
+    def measure_throughput(self, tts_model, threads_count, instances, repeats=2):
+        # Instances run side by side on the shared model, which costs the same cores as separate copies
+        # without loading them; torch.set_num_threads is process wide, so every instance gets threads_count
+        torch.set_num_threads(threads_count)
+        self.synthesize_benchmark(tts_model)
+        audio_seconds = [0.0] * instances
+
+        def run(index):
+            for _ in range(repeats):
+                audio_seconds[index] += self.synthesize_benchmark(tts_model).size()[0] / self.sample_rate
+
+        workers = [threading.Thread(target=run, args=(index,)) for index in range(instances)]
+        t0 = timeit.default_timer()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return sum(audio_seconds) / (timeit.default_timer() - t0)
+
+    def tune_cpu(self, tts_model):
+        cpu_count = os.cpu_count() or 1
+        candidates = sorted({1, 2, 4, 8, cpu_count} & set(range(1, cpu_count + 1)))
+        best_threads, best_instances, best_throughput = 1, 1, 0
+        results = {}
+
+        for threads_count in candidates:
+            max_fit = max(1, min(self.max_instances, cpu_count // threads_count))
+            for instances in sorted({1, max_fit} | {count for count in (2, 4, 8) if count < max_fit}):
+                # Seconds of audio per wall second, measured with the instances actually running in parallel
+                throughput = self.measure_throughput(tts_model, threads_count, instances)
+                results[f"{threads_count}x{instances}"] = {"threads": threads_count, "instances": instances, "throughput": round(throughput, 2)}
+                logging.info(f"Silero benchmark: {instances} instance(s) x {threads_count} thread(s) -> {throughput:.2f}x real time")
+                if throughput > best_throughput:
+                    best_threads, best_instances, best_throughput = threads_count, instances, throughput
+
+        self.metrics["benchmark"] = results
+        self.metrics["expected_throughput"] = round(best_throughput, 2)
+        return best_threads, best_instances
+
     def transliterate_to_russian(self, text):
         return self.translit.transliterate(text)
 
@@ -267,7 +377,8 @@ class SileroTTSGenerator:
             )
             
             try:
-                audio = tts_model.apply_tts(text=line, speaker=speaker, sample_rate=self.sample_rate,  put_accent=self.put_accent, put_yo=self.put_yo)
+                with torch.inference_mode():
+                    audio = tts_model.apply_tts(text=line, speaker=speaker, sample_rate=self.sample_rate,  put_accent=self.put_accent, put_yo=self.put_yo)
                 next_chunk_size = int(audio.size()[0] * self.wave_sample_width)
                 wf, audio_size, wave_file_number = self.write_wave_chunk(wf, audio, audio_size,
                                                                          wave_data_limit, wave_file_number, s)
@@ -278,13 +389,22 @@ class SileroTTSGenerator:
             current_line += 1
             s.update(line, next_chunk_size)
 
+        wf.close()
+
 
     def generate_audio_file(self, text, selected_speaker, output_filename):
         logging.info("Start generating audio file")
         origin_lines = [text]
         line_length_limit = self.line_length_limits[selected_speaker]
         preprocessed_lines, preprocessed_text_len = self.preprocess_text(origin_lines, line_length_limit)
-        self.process_tts(self.tts_model, preprocessed_lines, output_filename, self.wave_file_size_limit, preprocessed_text_len, speaker=selected_speaker)
+        if self.model_pool is None:
+            self.process_tts(self.tts_model, preprocessed_lines, output_filename, self.wave_file_size_limit, preprocessed_text_len, speaker=selected_speaker)
+            return
+        tts_model = self.model_pool.get()
+        try:
+            self.process_tts(tts_model, preprocessed_lines, output_filename, self.wave_file_size_limit, preprocessed_text_len, speaker=selected_speaker)
+        finally:
+            self.model_pool.put(tts_model)
 
 
     def download_models_config(self):
@@ -10,12 +10,16 @@ class SileroTTS(BaseTTS):
 
     SUPPORTED_VOICES = ['aidar', 'baya', 'eugene', 'kseniya', 'xenia', 'random']
 
-    def __init__(self):
+    def __init__(self, num_threads=2, optimization="none", max_instances=1):
         super().__init__()
-        self.generator = SileroTTSGenerator()
+        self.generator = SileroTTSGenerator(num_threads, optimization, max_instances)
+
+    @property
+    def metrics(self) -> dict:
+        return self.generator.metrics
 
     def convert_wav_to_ogg(self, wav_path, ogg_path):
-        audio = AudioSegment.from_wav(wav_path)
+        audio = self.postprocess(AudioSegment.from_wav(wav_path))
         audio.export(ogg_path, format="ogg")
         os.remove(wav_path)
 
@@ -19,7 +19,7 @@ class YandexTTS(BaseTTS):
         self.translit = Translit()
 
     def convert_mp3_to_ogg(self, mp3_path, ogg_path):
-        audio = AudioSegment.from_mp3(mp3_path)
+        audio = self.postprocess(AudioSegment.from_mp3(mp3_path))
         audio.export(ogg_path, format="ogg")
         os.remove(mp3_path)
 
@@ -1,31 +1,149 @@
 import os
+import time
+from contextlib import contextmanager
+from typing import Optional
 
-from flask import Blueprint, abort, jsonify, make_response, request, send_file
+from flask import Blueprint, Response, abort, g, jsonify, make_response, request, send_file, url_for
 
+from models.story_model import StoryModel
 from repos import StoryRepository
+from services.demand_tracker import DemandTracker
+from services.profiler import Profiler
+from services.story_pack import PACK_AUDIO_PREFIX, StoryPack
+from services.voice.audio_info import get_ogg_duration
 
 
 class StoryController:
-    def __init__(self, story_repository: StoryRepository):
+    MAX_LOOKAHEAD = 10
+    TIMED_ENDPOINTS = {"get_scenario", "get_audio"}
+
+    def __init__(self, story_repository: StoryRepository, demand_tracker: Optional[DemandTracker] = None, story_pack: Optional[StoryPack] = None, profiler: Optional[Profiler] = None):
         self.story_repository = story_repository
+        self.demand_tracker = demand_tracker
+        self.story_pack = story_pack
+        self.profiler = profiler
         self.story_routes = Blueprint('story_routes', __name__)
+
+        if self.profiler:
+            @self.story_routes.before_request
+            def start_timing():
+                g.request_started = time.perf_counter()
+                g.request_phases = {}
+
+            @self.story_routes.after_request
+            def record_timing(response):
+                # Tenant apps register the blueprint under per-config names, so match on the view name only
+                if request.endpoint and request.endpoint.rsplit(".", 1)[-1] in self.TIMED_ENDPOINTS:
+                    total_ms = (time.perf_counter() - g.request_started) * 1000
+                    self.profiler.record_request(request.method, request.full_path, response.status_code, total_ms, g.request_phases)
+                return response
         
         @self.story_routes.route("/story/getStory", methods=["GET"])
         def get_scenario():
-            story = self.story_repository.get_story_by_priority()
+            if self.demand_tracker:
+                self.demand_tracker.record_request()
+            with self._timed("repository"):
+                story = self.story_repository.get_story_by_priority(self._include_streaming())
+            if story is None and self.story_pack:
+                with self._timed("pack"):
+                    story = self.story_pack.next_story()
             if story is None:
                 abort(404, "No story found")
-            return jsonify(story.dict())
+            with self._timed("serialize"):
+                return jsonify(self._story_payload(story))
+
+        @self.story_routes.route("/story/<string:story_id>", methods=["GET"])
+        def get_story(story_id):
+            story = self.story_repository.get_story(story_id)
+            if story is None and self.story_pack:
+                story = self.story_pack.get_story(story_id)
+            if story is None:
+                abort(404, "No story found")
+            return jsonify(self._story_payload(story))
+
+        @self.story_routes.route("/story/lookahead", methods=["GET"])
+        def get_lookahead():
+            if self.demand_tracker:
+                self.demand_tracker.record_request()
+            count = max(1, min(request.args.get("count", default=3, type=int), self.MAX_LOOKAHEAD))
+            client_id = request.args.get("client", default="default")
+            stories = self.story_repository.get_lookahead(client_id, count, self._include_streaming())
+            return jsonify({"stories": [self._story_manifest(position, story) for position, story in enumerate(stories)]})
 
         @self.story_routes.route("/delete/<string:story_id>", methods=["DELETE"])
         def delete_scenario(story_id):
-            self.story_repository.delete_story(story_id)
+            # Packs are built from the stories collection, so the same id may still be live in the database
+            deleted = self.story_repository.delete_story(story_id)
+            if not deleted and self.story_pack and self.story_pack.has_story(story_id):
+                self.story_pack.mark_played(story_id)
+            if self.demand_tracker:
+                self.demand_tracker.record_consumed()
             return make_response(jsonify({"message": "Deleted successfully"}), 200)
 
         @self.story_routes.route("/audio/<path:audio_path>", methods=["GET"])
         def get_audio(audio_path):
+            if self.story_pack and audio_path.startswith(f"{PACK_AUDIO_PREFIX}/"):
+                with self._timed("pack"):
+                    return self._get_pack_audio(audio_path)
             full_audio_path = os.path.join(os.getcwd(), audio_path)
-            if os.path.exists(full_audio_path):
-                return send_file(full_audio_path)
+            with self._timed("filesystem"):
+                exists = os.path.exists(full_audio_path)
+            if exists:
+                with self._timed("send_file"):
+                    return send_file(full_audio_path)
             else:
                 abort(404, "Audio file not found")
+
+    def _get_pack_audio(self, audio_path: str):
+        parts = audio_path.split("/")
+        clip = None
+        if len(parts) == 4 and parts[1] == self.story_pack.name and parts[3].endswith(".ogg"):
+            pos = parts[3][:-len(".ogg")]
+            clip = self.story_pack.read_clip(parts[2], int(pos)) if pos.isdigit() else None
+        if clip is None:
+            abort(404, "Audio file not found")
+        return Response(clip, mimetype="audio/ogg")
+
+    @contextmanager
+    def _timed(self, phase: str):
+        if not self.profiler:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            g.request_phases[phase] = g.request_phases.get(phase, 0) + (time.perf_counter() - started) * 1000
+
+    def _include_streaming(self) -> bool:
+        return request.args.get("streaming", default=0, type=int) == 1
+
+    def _story_payload(self, story: StoryModel) -> dict:
+        # Streaming stories only expose the lines that are already voiced, in order
+        payload = story.dict()
+        payload["scenario"] = [line.dict() for line in story.ready_lines()]
+        return payload
+
+    def _story_manifest(self, position: int, story: StoryModel) -> dict:
+        clips = []
+        for line in story.scenario:
+            full_audio_path = os.path.join(os.getcwd(), line.sound)
+            size = os.path.getsize(full_audio_path) if line.ready and os.path.exists(full_audio_path) else None
+            duration = line.duration if line.duration is not None or not line.ready else get_ogg_duration(full_audio_path)
+            clips.append({
+                "ready": line.ready,
+                "character": line.character,
+                "text": line.text,
+                "sound": line.sound,
+                "url": url_for(".get_audio", audio_path=line.sound),
+                "size": size,
+                "duration": duration,
+            })
+
+        return {
+            "position": position,
+            "story": self._story_payload(story),
+            "clips": clips,
+            "total_size": sum(clip["size"] or 0 for clip in clips),
+            "total_duration": sum(clip["duration"] or 0 for clip in clips),
+        }
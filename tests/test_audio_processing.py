@@ -0,0 +1,18 @@
+import numpy as np
+
+from services.voice.audio_processing import AudioPostProcessor
+
+
+def test_resample_keeps_clips_shorter_than_the_filter():
+    processor = AudioPostProcessor()
+    for length in (10, 62, 63, 64, 1000):
+        samples = np.ones(length, dtype=np.float32)
+        assert len(processor.resample(samples, 48000, 24000)) == round(length / 2)
+
+
+def test_resample_lowpass_is_centered():
+    samples = np.zeros(1001, dtype=np.float32)
+    samples[500] = 1
+    filtered = AudioPostProcessor._lowpass(samples, 0.5)
+    assert len(filtered) == len(samples)
+    assert np.argmax(filtered) == 500
@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# torch alone takes several seconds to import, the rest of the app well under one
+IMPORT_BUDGET_SECONDS = 3.0
+HEAVY_MODULES = ("torch", "num2words", "services.voice.silero")
+
+
+def import_main():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import json, sys, main; print(json.dumps(sorted(sys.modules)))"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout), result.stderr
+
+
+def cumulative_seconds(importtime_log: str, module: str) -> float:
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    for line in importtime_log.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1_000_000
+    raise AssertionError(f"{module} not found in the -X importtime output")
+
+
+def test_main_does_not_import_tts_backends():
+    modules, _ = import_main()
+    loaded = [module for module in modules if any(module == heavy or module.startswith(f"{heavy}.") or module.startswith(f"{heavy}_") for heavy in HEAVY_MODULES)]
+    assert loaded == []
+
+
+def test_main_import_time_within_budget():
+    _, importtime_log = import_main()
+    seconds = cumulative_seconds(importtime_log, "main")
+    assert seconds < IMPORT_BUDGET_SECONDS, f"import main took {seconds:.2f}s, budget is {IMPORT_BUDGET_SECONDS}s"